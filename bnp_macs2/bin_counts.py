@@ -0,0 +1,93 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+import numpy as np
+from bionumpy.datatypes import Interval
+from bionumpy.genomic_data import Genome, GenomicIntervals
+from bionumpy.genomic_data.genome_context_base import GenomeContextBase
+from .macs2 import Macs2, Macs2Params
+from .ingest import read_reads, read_blacklist
+logger = logging.getLogger(__name__)
+
+
+def get_bin_offsets(chrom_sizes: Dict[str, int], bin_size: int) -> np.ndarray:
+    '''Index of the first bin of each chromosome, followed by the total number of bins'''
+    n_bins = (np.array(list(chrom_sizes.values()), dtype=int)+bin_size-1)//bin_size
+    return np.insert(np.cumsum(n_bins), 0, 0)
+
+
+def get_bins(chrom_sizes: Dict[str, int], bin_size: int) -> Interval:
+    offsets = get_bin_offsets(chrom_sizes, bin_size)
+    chromosome_idx = np.repeat(np.arange(len(chrom_sizes)), np.diff(offsets))
+    starts = (np.arange(offsets[-1])-offsets[chromosome_idx])*bin_size
+    sizes = np.array(list(chrom_sizes.values()), dtype=int)
+    names = list(chrom_sizes)
+    return Interval([names[i] for i in chromosome_idx], starts,
+                    np.minimum(starts+bin_size, sizes[chromosome_idx]))
+
+
+def count_in_bins(fragments: Interval, genome_context: GenomeContextBase, bin_size: int, mode: str = 'midpoint') -> np.ndarray:
+    '''Count fragments per fixed size bin over the whole genome
+
+    With mode `midpoint` each fragment is counted in the bin holding its
+    midpoint. With mode `overlap` it is counted in every bin it overlaps.
+    '''
+    fragments = genome_context.mask_data(fragments)
+    offsets = get_bin_offsets(genome_context.chrom_sizes, bin_size)
+    chromosome_offset = offsets[fragments.chromosome.raw()]
+    if mode == 'midpoint':
+        midpoints = (fragments.start+fragments.stop)//2
+        return np.bincount(chromosome_offset + midpoints//bin_size, minlength=offsets[-1])
+    if mode == 'overlap':
+        first = chromosome_offset + fragments.start//bin_size
+        last = chromosome_offset + (fragments.stop-1)//bin_size
+        changes = np.bincount(first, minlength=offsets[-1]+1)-np.bincount(last+1, minlength=offsets[-1]+1)
+        return np.cumsum(changes[:-1])
+    raise ValueError(f'Unknown bin count mode: {mode}, should be midpoint or overlap')
+
+
+def get_sample_bin_counts(filename: str, genome_context: GenomeContextBase, bin_size: int,
+                          fragment_length: int = 150, mode: str = 'midpoint', blacklist: Interval = None) -> np.ndarray:
+    intervals = read_reads(filename, genome_context, blacklist)
+    reads = GenomicIntervals.from_intervals(intervals, genome_context, is_stranded=True)
+    fragments = Macs2(Macs2Params(fragment_length=fragment_length)).get_fragments(reads)
+    return count_in_bins(fragments.data, genome_context, bin_size, mode)
+
+
+def _fill_row(out_filename: str, row: int, filename: str, genome_file: str, bin_size: int,
+              fragment_length: int, mode: str, blacklist_filename: str):
+    genome_context = Genome.from_file(genome_file).get_genome_context()
+    blacklist = None
+    if blacklist_filename is not None:
+        blacklist = read_blacklist(blacklist_filename, genome_context)
+    counts = get_sample_bin_counts(filename, genome_context, bin_size, fragment_length, mode, blacklist)
+    matrix = np.load(out_filename, mmap_mode='r+')
+    matrix[row] = counts
+    matrix.flush()
+    logger.info(f'Wrote bin counts for {filename}')
+
+
+def write_bin_count_matrix(filenames: List[str], genome_file: str, out_filename: str, bin_size: int = 200,
+                           fragment_length: int = 150, mode: str = 'midpoint', blacklist_filename: str = None,
+                           n_jobs: int = 1) -> np.memmap:
+    '''Fill a memory-mapped samples x bins `.npy` matrix, one sample per row
+
+    Rows are written by each worker as soon as its sample is counted, so
+    the full matrix is never held in memory.
+    '''
+    chrom_sizes = Genome.from_file(genome_file).get_genome_context().chrom_sizes
+    n_bins = int(get_bin_offsets(chrom_sizes, bin_size)[-1])
+    matrix = np.lib.format.open_memmap(out_filename, mode='w+', dtype=np.uint32,
+                                       shape=(len(filenames), n_bins))
+    matrix.flush()
+    del matrix
+    args = [(out_filename, row, filename, genome_file, bin_size, fragment_length, mode, blacklist_filename)
+            for row, filename in enumerate(filenames)]
+    if n_jobs == 1:
+        for arg in args:
+            _fill_row(*arg)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            for future in [executor.submit(_fill_row, *arg) for arg in args]:
+                future.result()
+    return np.load(out_filename, mmap_mode='r')
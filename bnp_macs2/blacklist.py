@@ -0,0 +1,57 @@
+import logging
+import numpy as np
+from bionumpy.datatypes import Interval
+from bionumpy.genomic_data.genome_context_base import GenomeContextBase
+from .reads import drop_unknown_chromosomes
+logger = logging.getLogger(__name__)
+
+
+def _global_start_stops(intervals: Interval, genome_context: GenomeContextBase):
+    intervals = genome_context.mask_data(intervals)
+    return genome_context.global_offset.start_ends_from_intervals(intervals, do_clip=True)
+
+
+def merge_regions(regions: Interval, genome_context: GenomeContextBase) -> Interval:
+    '''Sort, clip and merge overlapping excluded regions
+
+    Regions on chromosomes that are not in the genome, like chrM or
+    unplaced contigs, are dropped.
+    '''
+    regions = genome_context.mask_data(drop_unknown_chromosomes(regions, genome_context))
+    if len(regions) == 0:
+        return regions
+    starts, stops = _global_start_stops(regions, genome_context)
+    order = np.argsort(starts, kind='stable')
+    starts, stops = starts[order], stops[order]
+    ends = np.maximum.accumulate(stops)
+    is_new = np.ones(len(starts), dtype=bool)
+    is_new[1:] = starts[1:] > ends[:-1]
+    group_starts = np.flatnonzero(is_new)
+    group_ends = np.append(group_starts[1:], len(starts))-1
+    merged = Interval(['global']*len(group_starts), starts[group_starts], ends[group_ends])
+    return genome_context.global_offset.to_local_interval(merged)
+
+
+def region_size(regions: Interval) -> int:
+    return int(np.sum(regions.stop-regions.start))
+
+
+def overlaps_regions(intervals: Interval, regions: Interval, genome_context: GenomeContextBase) -> np.ndarray:
+    '''Mask of the `intervals` that overlap any of the merged `regions`
+
+    Both sets are put on global coordinates so that the overlap join
+    for all chromosomes is done with a single `searchsorted`.
+    '''
+    region_starts, region_stops = _global_start_stops(regions, genome_context)
+    starts, stops = _global_start_stops(intervals, genome_context)
+    if len(region_starts) == 0:
+        return np.zeros(len(starts), dtype=bool)
+    idx = np.searchsorted(region_starts, stops, side='left')-1
+    return (idx >= 0) & (region_stops[np.maximum(idx, 0)] > starts)
+
+
+def remove_blacklisted(intervals: Interval, regions: Interval, genome_context: GenomeContextBase) -> Interval:
+    intervals = genome_context.mask_data(intervals)
+    mask = overlaps_regions(intervals, regions, genome_context)
+    logger.info(f'Removing {mask.sum()} of {len(intervals)} reads in blacklisted regions')
+    return intervals[~mask]
@@ -1,45 +1,78 @@
 """Console script for bnp_macs2."""
+from typing import List
 import typer
 import numpy as np
 import logging
 
 import bionumpy as bnp
-from bionumpy.genomic_data import Genome
+from bionumpy.genomic_data import Genome, GenomicIntervals
 from .macs2 import Macs2, Macs2Params
 from .listener import Macs2Listner, StreamListner
+from .merge import merge_sorted_intervals, merge_sorted_interval_streams, downsample, subsample_stream
+from .blacklist import region_size
+from .ingest import open_reads, read_reads, read_read_chunks, count_reads, read_blacklist
+from .bin_counts import write_bin_count_matrix, get_bins
 
 logging.basicConfig(level=logging.INFO)
 
-stream = False
 
 
-def main(filename: str,
+def main(filenames: List[str],
          genome_file: str,
          fragment_length: int = 150,
          p_value_cutoff: float = 0.001,
-         outprefix: str = None):
+         outprefix: str = None,
+         scale_replicates: bool = False,
+         blacklist: str = None,
+         stream: bool = False):
+    '''Call peaks on the reads pooled from one or more replicate BED files
 
+    With --stream the files must be sorted by chromosome in the same order
+    as the genome file, since only one chromosome is kept in memory.
+    '''
+    if isinstance(filenames, str):
+        filenames = [filenames]
     genome = Genome.from_file(genome_file)
+    genome_context = genome.get_genome_context()
     # bnp.open(genome_file, buffer_type=bnp.io.files.ChromosomeSizeBuffer).read()
     # chrom_sizes = {str(name): size for name, size in zip(genome.name, genome.size)}
-    tmp = bnp.open(filename, buffer_type=bnp.io.delimited_buffers.Bed6Buffer).read_chunk()
-    tag_size = np.median(tmp.stop-tmp.start)
+    first_chunks = [open_reads(filename).read_chunk() for filename in filenames]
+    tag_size = np.median(np.concatenate([tmp.stop-tmp.start for tmp in first_chunks]))
+    effective_genome_size = genome.size
+    regions = None
+    if blacklist is not None:
+        regions = read_blacklist(blacklist, genome_context)
+        effective_genome_size -= region_size(regions)
     if stream:
-        intervals = bnp.open(filename, buffer_type=bnp.io.delimited_buffers.Bed6Buffer).read_chunks()
+        read_counts = [count_reads(filename, genome_context, regions) for filename in filenames]
+        streams = [read_read_chunks(filename, genome_context, regions) for filename in filenames]
     else:
-        intervals = bnp.open(filename, buffer_type=bnp.io.delimited_buffers.Bed6Buffer).read()
-    # intervals = bnp.open(filename, buffer_type=bnp.io.delimited_buffers.Bed6Buffer).read_chunks()
+        interval_sets = [read_reads(filename, genome_context, regions) for filename in filenames]
+        read_counts = [len(intervals) for intervals in interval_sets]
+    kept_counts = read_counts
+    if scale_replicates:
+        logging.info(f'Scaling replicates {read_counts} down to {min(read_counts)} reads')
+        kept_counts = [min(read_counts)]*len(filenames)
+    if stream:
+        if scale_replicates:
+            streams = [subsample_stream(s, total, kept, seed=i)
+                       for i, (s, kept, total) in enumerate(zip(streams, kept_counts, read_counts))]
+        merged = merge_sorted_interval_streams(streams, genome_context)
+    else:
+        interval_sets = [downsample(intervals, n, seed=i)
+                         for i, (intervals, n) in enumerate(zip(interval_sets, kept_counts))]
+        merged = merge_sorted_intervals(interval_sets, genome_context)
     listner = Macs2Listner(lambda name: outprefix+name)
     listner = StreamListner(lambda name: outprefix+name)
     params = Macs2Params(
         fragment_length=fragment_length,
         p_value_cutoff=p_value_cutoff,
         max_gap=int(tag_size),
-        n_reads=bnp.count_entries(filename),
-        effective_genome_size = genome.size)
+        n_reads=sum(kept_counts),
+        effective_genome_size=effective_genome_size)
 
-    m = Macs2(params, listner)
-    intervals = genome.read_intervals(filename, stream=False, stranded=True)
+    m = Macs2(params, listner, blacklist=regions)
+    intervals = GenomicIntervals.from_intervals(merged, genome_context, is_stranded=True)
     # genomic_intervals = genome.open(filename, ...) -> Ineterf
     #if stream:
     #    genomic_intervals = GenomicIntervals.from_interval_stream(intervals, chrom_sizes)
@@ -48,9 +81,29 @@ def main(filename: str,
     return m.run(intervals)
 
 
+def bin_counts(filenames: List[str],
+               genome_file: str,
+               outprefix: str,
+               bin_size: int = 200,
+               fragment_length: int = 150,
+               mode: str = 'midpoint',
+               blacklist: str = None,
+               n_jobs: int = 1):
+    '''Write a samples x bins matrix of fragment counts, one sample per file'''
+    write_bin_count_matrix(filenames, genome_file, outprefix+'bin_counts.npy', bin_size=bin_size,
+                           fragment_length=fragment_length, mode=mode,
+                           blacklist_filename=blacklist, n_jobs=n_jobs)
+    chrom_sizes = Genome.from_file(genome_file).get_genome_context().chrom_sizes
+    bnp.open(outprefix+'bins.bed', 'w').write(get_bins(chrom_sizes, bin_size))
+
+
 def run():
     typer.run(main)
 
 
+def run_bin_counts():
+    typer.run(bin_counts)
+
+
 if __name__ == "__main__":
     run()
@@ -0,0 +1,36 @@
+import bionumpy as bnp
+from bionumpy.datatypes import Interval
+from bionumpy.genomic_data.genome_context_base import GenomeContextBase
+from bionumpy.streams import NpDataclassStream
+from .blacklist import merge_regions, remove_blacklisted
+from .reads import drop_unknown_chromosomes
+
+
+def open_reads(filename: str):
+    # Lazy bionumpy data can not be extended to fragments
+    return bnp.open(filename, buffer_type=bnp.io.delimited_buffers.Bed6Buffer, lazy=False)
+
+
+def filter_reads(intervals: Interval, genome_context: GenomeContextBase, blacklist: Interval = None) -> Interval:
+    '''Drop reads on chromosomes not in the genome and, if given, in blacklisted regions'''
+    intervals = drop_unknown_chromosomes(intervals, genome_context)
+    if blacklist is not None:
+        intervals = remove_blacklisted(intervals, blacklist, genome_context)
+    return intervals
+
+
+def read_reads(filename: str, genome_context: GenomeContextBase, blacklist: Interval = None) -> Interval:
+    return filter_reads(open_reads(filename).read(), genome_context, blacklist)
+
+
+def read_read_chunks(filename: str, genome_context: GenomeContextBase, blacklist: Interval = None) -> NpDataclassStream:
+    return NpDataclassStream(filter_reads(chunk, genome_context, blacklist)
+                             for chunk in open_reads(filename).read_chunks())
+
+
+def count_reads(filename: str, genome_context: GenomeContextBase, blacklist: Interval = None) -> int:
+    return sum(len(chunk) for chunk in read_read_chunks(filename, genome_context, blacklist))
+
+
+def read_blacklist(filename: str, genome_context: GenomeContextBase) -> Interval:
+    return merge_regions(bnp.open(filename, lazy=False).read(), genome_context)
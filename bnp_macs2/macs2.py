@@ -7,6 +7,7 @@ import logging
 import bionumpy as bnp
 from bionumpy.datatypes import Interval, Bed6, NarrowPeak
 from bionumpy.genomic_data import GenomicArray, GenomicIntervals
+from bionumpy.genomic_data.genomic_track import GenomicArrayNode
 from bionumpy.bnpdataclass import replace
 from bionumpy.computation_graph import compute, ComputationNode
 from .listener import Listner, register
@@ -14,12 +15,6 @@ from .listener import Listner, register
 logger = logging.getLogger(__name__)
 
 
-def get_windows(intervals: GenomicIntervals, flank: int):
-    return intervals.get_location('start').get_windows(window_size=flank*2)
-    return replace(intervals, start=intervals.start-flank,
-                   stop=intervals.start+flank)
-
-
 def remove_small_intervals(intervals: Interval, min_length: int):
     return intervals[(intervals.stop-intervals.start) >= min_length]
 
@@ -40,9 +35,10 @@ def logsf(count: float, mu: float) -> float:
 
 
 class Macs2:
-    def __init__(self, params: Macs2Params, listner: Listner=None):
+    def __init__(self, params: Macs2Params, listner: Listner=None, blacklist: Interval=None):
         self._params = params
         self._listner = listner
+        self._blacklist = blacklist
 
     @property
     def params(self):
@@ -51,19 +47,24 @@ class Macs2:
     @register('peaks')
     def run(self, intervals: Interval) -> Interval:
         fragment_pileup = self.get_fragment_pileup(intervals)
-        control = self.get_control_pileup(intervals, [10000])
+        control = self.get_control_pileup(intervals, self._params.window_sizes)
         p_scores = logsf(fragment_pileup, control)
         peaks = self.call_peaks(p_scores)
         return self.get_narrow_peak(peaks, np.log10(np.e)*-p_scores)
 
+    def get_fragments(self, reads: GenomicIntervals) -> GenomicIntervals:
+        return reads.extended_to_size(self._params.fragment_length)
+
     @register('treat_pileup')
     def get_fragment_pileup(self, reads: GenomicIntervals) -> GenomicArray:
-        fragments = reads.extended_to_size(self._params.fragment_length)
-        return fragments.get_pileup()
+        return self.get_fragments(reads).get_pileup()
 
     def _get_average_pileup(self, reads: GenomicIntervals, window_size: int) -> GenomicArray:
-        # windows = reads.get_location('start').get_windows(window_size//2)
-        windows = get_windows(reads, window_size//2)
+        if reads.is_stranded():
+            # Streamed intervals only support unstranded locations, so move the 5' end to start
+            five_prime = np.where(reads.strand == '+', reads.start, reads.stop-1)
+            reads = replace(reads, start=five_prime)
+        windows = reads.get_location('start').get_windows(window_size=window_size)
         return windows.get_pileup()/window_size
 
     @register('control_lambda')
@@ -77,7 +78,16 @@ class Macs2:
     def call_peaks(self, log_p_values: GenomicArray):
         peaks = log_p_values < np.log(self._params.p_value_cutoff)
         peaks = GenomicIntervals.from_track(peaks)
+        if not peaks.is_stream and len(peaks.data) == 0:
+            # bionumpy can not merge an empty set of in-memory intervals
+            return peaks
         peaks = peaks.merged(distance=self._params.max_gap)
+        if self._blacklist is not None and len(self._blacklist):
+            # Masked after merging so that peaks are not bridged across excluded regions
+            blacklist = GenomicIntervals.from_intervals(self._blacklist, log_p_values.genome_context)
+            if isinstance(log_p_values, GenomicArrayNode):
+                blacklist = blacklist.as_stream()
+            peaks = GenomicIntervals.from_track(peaks.get_mask() & ~blacklist.get_mask())
         peaks = remove_small_intervals(peaks, self._params.fragment_length)
         return peaks
 
@@ -0,0 +1,101 @@
+import logging
+from typing import List, Iterable
+import numpy as np
+import bionumpy as bnp
+from bionumpy.datatypes import Interval
+from bionumpy.genomic_data.genome_context_base import GenomeContextBase
+from bionumpy.streams import NpDataclassStream
+from .reads import drop_unknown_chromosomes
+logger = logging.getLogger(__name__)
+
+
+def downsample(intervals: Interval, n_reads: int, seed: int = 0) -> Interval:
+    '''Randomly keep `n_reads` of the intervals, preserving their order'''
+    if n_reads >= len(intervals):
+        return intervals
+    rng = np.random.default_rng(seed)
+    mask = np.zeros(len(intervals), dtype=bool)
+    mask[rng.choice(len(intervals), n_reads, replace=False)] = True
+    return intervals[mask]
+
+
+def merge_sorted_intervals(interval_sets: List[Interval], genome_context: GenomeContextBase) -> Interval:
+    '''K-way merge of chromosome-sorted intervals into one chromosome-sorted set
+
+    Each entry's position in the output is computed directly from the
+    per-input chromosome counts. Inputs whose chromosomes are in another
+    order than the genome, like `sort -k1,1` output, are first stably
+    sorted by chromosome.
+    '''
+    interval_sets = [genome_context.mask_data(drop_unknown_chromosomes(intervals, genome_context))
+                     for intervals in interval_sets]
+    codes = [intervals.chromosome.raw() for intervals in interval_sets]
+    for i, c in enumerate(codes):
+        if np.any(c[1:] < c[:-1]):
+            order = np.argsort(c, kind='stable')
+            interval_sets[i], codes[i] = interval_sets[i][order], c[order]
+    n_chromosomes = max((c.max()+1 for c in codes if len(c)), default=0)
+    counts = np.array([np.bincount(c, minlength=n_chromosomes) for c in codes]).reshape(len(codes), n_chromosomes)
+    first_in_input = np.cumsum(counts, axis=1)-counts
+    chromosome_major = counts.T.ravel()
+    offsets = (np.cumsum(chromosome_major)-chromosome_major).reshape(n_chromosomes, len(codes)).T
+    positions = np.concatenate(
+        [offsets[i, c] + np.arange(len(c)) - first_in_input[i, c] for i, c in enumerate(codes)])
+    order = np.empty_like(positions)
+    order[positions] = np.arange(len(positions))
+    return np.concatenate(interval_sets)[order]
+
+
+def _grouped_by_rank(stream, rank):
+    # bionumpy can not group empty chunks, which e.g. the blacklist filter can leave
+    stream = NpDataclassStream(chunk for chunk in stream if len(chunk))
+    for name, group in bnp.groupby(stream, 'chromosome'):
+        if name not in rank:
+            logger.info(f'Skipping reads on {name}, not included in genome')
+            continue
+        yield rank[name], group
+
+
+def _merge_grouped(grouped_streams):
+    heads = [next(grouped, None) for grouped in grouped_streams]
+    while any(head is not None for head in heads):
+        current = min(head[0] for head in heads if head is not None)
+        groups = []
+        for i, head in enumerate(heads):
+            if head is None or head[0] != current:
+                continue
+            groups.append(head[1])
+            heads[i] = next(grouped_streams[i], None)
+            if heads[i] is not None and heads[i][0] <= current:
+                raise ValueError(f'Input {i} is not sorted by chromosome in genome order')
+        yield np.concatenate(groups)
+
+
+def merge_sorted_interval_streams(streams: Iterable[Iterable[Interval]], genome_context: GenomeContextBase) -> NpDataclassStream:
+    '''K-way merge of chromosome-sorted interval streams
+
+    Only the reads for one chromosome at the time are kept in memory.
+    '''
+    rank = {name: i for i, name in enumerate(genome_context.chrom_sizes)}
+    grouped_streams = [_grouped_by_rank(stream, rank) for stream in streams]
+    return NpDataclassStream(_merge_grouped(grouped_streams))
+
+
+def subsample_stream(stream: Iterable[Interval], n_total: int, n_reads: int, seed: int = 0) -> Iterable[Interval]:
+    '''Randomly keep exactly `n_reads` of the `n_total` intervals in a stream
+
+    The number kept from each chunk is drawn from the hypergeometric
+    distribution of the reads not yet seen.
+    '''
+    if n_reads >= n_total:
+        return stream
+    rng = np.random.default_rng(seed)
+
+    def _subsampled():
+        remaining, to_keep = n_total, n_reads
+        for chunk in stream:
+            n_chunk = min(len(chunk), remaining)
+            k = rng.hypergeometric(to_keep, remaining-to_keep, n_chunk) if n_chunk else 0
+            remaining, to_keep = remaining-n_chunk, to_keep-k
+            yield downsample(chunk, k, seed=rng)
+    return NpDataclassStream(_subsampled())
@@ -11,7 +11,9 @@ def macs2(reads, params):
     global_average = params.n_reads/params.effective_genome_size
     control_pileup = reduce(np.maximum, local_averages, global_average) * params.fragment_length
     p_values = poisson_sf(fragment_pileup, control_pileup)
-    peaks = bnp.GenomicIntervals.from_track(p_values < params.p_value_cutoff).merged(distance=params.max_gap)
+    peaks = bnp.GenomicIntervals.from_track(p_values < params.p_value_cutoff)
+    if peaks.is_stream or len(peaks.data):  # bionumpy can not merge empty in-memory intervals
+        peaks = peaks.merged(distance=params.max_gap)
     peaks = peaks[peaks.stop-peaks.start >= params.fragment_length]
     peak_signals = np.log10(p_values[peaks])*-1
     peaks, max_values, mean_values = bnp.compute((peaks, peak_signals.max(axis=-1), peak_signals.mean(axis=-1)))
@@ -0,0 +1,17 @@
+import logging
+import numpy as np
+from bionumpy.datatypes import Interval
+from bionumpy.genomic_data.genome_context_base import GenomeContextBase
+logger = logging.getLogger(__name__)
+
+
+def drop_unknown_chromosomes(intervals: Interval, genome_context: GenomeContextBase) -> Interval:
+    '''Remove intervals on chromosomes that are not in the genome, like chrM or unplaced contigs'''
+    if getattr(intervals.chromosome, 'encoding', None) == genome_context.encoding:
+        # Already encoded with the genome's chromosomes, e.g. by `mask_data`
+        return intervals
+    is_known = np.isin(intervals.chromosome.tolist(), list(genome_context.chrom_sizes))
+    if np.all(is_known):
+        return intervals
+    logger.info(f'Ignoring {np.count_nonzero(~is_known)} intervals on chromosomes not in the genome')
+    return intervals[is_known]
@@ -32,6 +32,7 @@ setup(
     entry_points={
         'console_scripts': [
             'bnp_macs2=bnp_macs2.cli:run',
+            'bnp_macs2_bin_counts=bnp_macs2.cli:run_bin_counts',
         ],
     },
     install_requires=requirements,
@@ -1,4 +0,0 @@
-import hypothesis
-
-def test():
-    assert True
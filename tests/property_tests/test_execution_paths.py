@@ -0,0 +1,169 @@
+"""Differential tests and runtime gate for the different ways of running macs2
+
+Every execution path should produce the same NarrowPeak output for the
+same reads, both stranded and unstranded. The runtime gate only runs with
+``BNP_MACS2_PERF_TESTS=1`` (``make test-perf``), since the baseline holds
+wall-clock seconds from one machine, recorded under ``measured_on`` in
+``perf_baseline.json``. It then compares the runtime of each path on a
+fixed workload to that baseline. Set ``BNP_MACS2_UPDATE_PERF_BASELINE=1``
+(``make perf-baseline``) to rewrite the baseline on the current machine,
+and ``BNP_MACS2_PERF_TOLERANCE`` to change how many times slower than the
+baseline a path may get.
+"""
+import json
+import os
+import platform
+import time
+from pathlib import Path
+import numpy as np
+from numpy.testing import assert_equal, assert_allclose
+import bionumpy as bnp
+from bionumpy import Bed6
+from bionumpy.genomic_data import Genome, GenomicIntervals
+from bionumpy.streams import NpDataclassStream
+from hypothesis import given, settings, strategies as st
+import pytest
+from bnp_macs2.macs2 import Macs2, Macs2Params
+from bnp_macs2.oneliner import macs2
+from bnp_macs2.merge import merge_sorted_intervals, merge_sorted_interval_streams
+
+BASELINE_FILE = Path(__file__).parent / 'perf_baseline.json'
+PERF_TOLERANCE = float(os.environ.get('BNP_MACS2_PERF_TOLERANCE', 3.0))
+UPDATE_BASELINE = bool(os.environ.get('BNP_MACS2_UPDATE_PERF_BASELINE'))
+RUN_PERF_TESTS = bool(os.environ.get('BNP_MACS2_PERF_TESTS')) or UPDATE_BASELINE
+
+
+def run_class(reads, genome_context, params, stranded):
+    return Macs2(params).run(GenomicIntervals.from_intervals(reads, genome_context, is_stranded=stranded))
+
+
+def run_oneliner(reads, genome_context, params, stranded):
+    return macs2(GenomicIntervals.from_intervals(reads, genome_context, is_stranded=stranded), params)
+
+
+def run_stream(reads, genome_context, params, stranded):
+    stream = NpDataclassStream(iter([reads]))
+    return Macs2(params).run(GenomicIntervals.from_interval_stream(stream, genome_context, is_stranded=stranded))
+
+
+def split_replicates(reads, n_replicates=2):
+    replicate = np.random.default_rng(len(reads)).integers(0, n_replicates, len(reads))
+    return [reads[replicate == i] for i in range(n_replicates)]
+
+
+def run_merged(reads, genome_context, params, stranded):
+    merged = merge_sorted_intervals(split_replicates(reads), genome_context)
+    return Macs2(params).run(GenomicIntervals.from_intervals(merged, genome_context, is_stranded=stranded))
+
+
+def run_merged_stream(reads, genome_context, params, stranded):
+    streams = [NpDataclassStream(iter([replicate])) for replicate in split_replicates(reads)]
+    merged = merge_sorted_interval_streams(streams, genome_context)
+    return Macs2(params).run(GenomicIntervals.from_interval_stream(merged, genome_context, is_stranded=stranded))
+
+
+execution_paths = {'class': run_class,
+                   'oneliner': run_oneliner,
+                   'stream': run_stream,
+                   'merged': run_merged,
+                   'merged_stream': run_merged_stream}
+
+
+def assert_peaks_equal(peaks, true_peaks):
+    assert len(peaks) == len(true_peaks)
+    assert_equal(peaks.chromosome.tolist(), true_peaks.chromosome.tolist())
+    assert_equal(peaks.start, true_peaks.start)
+    assert_equal(peaks.stop, true_peaks.stop)
+    assert_equal(peaks.name.tolist(), true_peaks.name.tolist())
+    # score is int(10*max_value), so rounding noise can flip the last digit
+    assert_allclose(peaks.score, true_peaks.score, atol=1)
+    for field in ('signal_value', 'p_value', 'q_value'):
+        assert_allclose(np.asarray(getattr(peaks, field), dtype=float),
+                        np.asarray(getattr(true_peaks, field), dtype=float), rtol=1e-9)
+    assert_equal(peaks.summit, true_peaks.summit)
+
+
+def simulate_reads(chrom_sizes, n_background, n_peak_reads, read_length, rng):
+    entries = []
+    for name, size in chrom_sizes.items():
+        starts = rng.integers(0, size-read_length, n_background)
+        peak_center = rng.integers(read_length, size-2*read_length)
+        peak_starts = np.clip(peak_center + rng.integers(-read_length, read_length, n_peak_reads),
+                              0, size-read_length)
+        starts = np.sort(np.concatenate([starts, peak_starts]))
+        strands = rng.choice(['+', '-'], len(starts))
+        entries.extend((name, int(start), int(start)+read_length, '.', '0', strand)
+                       for start, strand in zip(starts, strands))
+    return Bed6.from_entry_tuples(entries)
+
+
+@st.composite
+def macs2_inputs(draw):
+    n_chromosomes = draw(st.integers(1, 3))
+    chrom_sizes = {f'chr{i+1}': draw(st.integers(500, 3000)) for i in range(n_chromosomes)}
+    rng = np.random.default_rng(draw(st.integers(0, 2**32-1)))
+    reads = simulate_reads(chrom_sizes,
+                           n_background=draw(st.integers(1, 100)),
+                           n_peak_reads=draw(st.integers(0, 60)),
+                           read_length=draw(st.integers(20, 50)),
+                           rng=rng)
+    params = Macs2Params(
+        fragment_length=draw(st.integers(20, 150)),
+        n_reads=len(reads),
+        p_value_cutoff=draw(st.sampled_from([0.05, 0.01, 0.001])),
+        max_gap=draw(st.integers(1, 50)),
+        effective_genome_size=sum(chrom_sizes.values()),
+        window_sizes=draw(st.lists(st.integers(100, 2000), min_size=1, max_size=3)))
+    return reads, Genome(chrom_sizes).get_genome_context(), params
+
+
+@pytest.mark.parametrize('stranded', [False, True])
+@pytest.mark.parametrize('path', [name for name in execution_paths if name != 'class'])
+@settings(max_examples=30, deadline=None)
+@given(inputs=macs2_inputs())
+def test_execution_paths_agree(path, stranded, inputs):
+    true_peaks = run_class(*inputs, stranded)
+    peaks = execution_paths[path](*inputs, stranded)
+    assert_peaks_equal(peaks, true_peaks)
+
+
+@pytest.fixture(scope='module')
+def perf_inputs():
+    chrom_sizes = {'chr1': 2000000, 'chr2': 1500000, 'chr3': 1000000}
+    reads = simulate_reads(chrom_sizes, n_background=30000, n_peak_reads=500, read_length=36,
+                           rng=np.random.default_rng(1234))
+    params = Macs2Params(fragment_length=150,
+                         n_reads=len(reads),
+                         effective_genome_size=sum(chrom_sizes.values()),
+                         window_sizes=(1000, 10000))
+    return reads, Genome(chrom_sizes).get_genome_context(), params, True
+
+
+@pytest.fixture(scope='module')
+def perf_baseline():
+    baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    yield baseline
+    if UPDATE_BASELINE:
+        baseline['measured_on'] = (f'{platform.system()} {platform.machine()}, Python {platform.python_version()}, '
+                                   f'bionumpy {bnp.__version__}')
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=4, sort_keys=True) + '\n')
+
+
+@pytest.mark.skipif(not RUN_PERF_TESTS, reason='Set BNP_MACS2_PERF_TESTS=1 to compare runtimes to the baseline')
+@pytest.mark.parametrize('path', list(execution_paths))
+def test_runtime_regression(path, perf_inputs, perf_baseline, record_property):
+    run = execution_paths[path]
+    times = []
+    for _ in range(3):
+        t = time.perf_counter()
+        run(*perf_inputs)
+        times.append(time.perf_counter()-t)
+    runtime = min(times)
+    record_property(f'{path}_runtime', runtime)
+    if UPDATE_BASELINE:
+        perf_baseline[path] = round(runtime, 4)
+        return
+    if path not in perf_baseline:
+        pytest.skip(f'No runtime baseline for {path}')
+    assert runtime <= perf_baseline[path]*PERF_TOLERANCE, \
+        f'{path} took {runtime:.3f}s, baseline is {perf_baseline[path]:.3f}s'
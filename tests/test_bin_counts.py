@@ -0,0 +1,50 @@
+import numpy as np
+from numpy.testing import assert_equal
+from bionumpy import Bed6
+from bionumpy.genomic_data import Genome
+from bnp_macs2.bin_counts import get_bin_offsets, get_bins, count_in_bins
+import pytest
+
+
+@pytest.fixture
+def chrom_sizes():
+    return {'chr1': 100, 'chr2': 60}
+
+
+@pytest.fixture
+def genome_context(chrom_sizes):
+    return Genome(chrom_sizes).get_genome_context()
+
+
+@pytest.fixture
+def fragments():
+    return Bed6.from_entry_tuples(
+        [('chr1', 0, 20, '.', '.', '+'),
+         ('chr1', 15, 35, '.', '.', '-'),
+         ('chr1', 90, 100, '.', '.', '+'),
+         ('chr2', 10, 60, '.', '.', '+')])
+
+
+def test_get_bin_offsets(chrom_sizes):
+    assert_equal(get_bin_offsets(chrom_sizes, 25), [0, 4, 7])
+
+
+def test_get_bins(chrom_sizes):
+    bins = get_bins(chrom_sizes, 25)
+    assert_equal(bins.start, [0, 25, 50, 75, 0, 25, 50])
+    assert_equal(bins.stop, [25, 50, 75, 100, 25, 50, 60])
+
+
+def test_count_in_bins_midpoint(fragments, genome_context):
+    assert_equal(count_in_bins(fragments, genome_context, 25, 'midpoint'),
+                 [1, 1, 0, 1, 0, 1, 0])
+
+
+def test_count_in_bins_overlap(fragments, genome_context):
+    assert_equal(count_in_bins(fragments, genome_context, 25, 'overlap'),
+                 [2, 1, 0, 1, 1, 1, 1])
+
+
+def test_count_in_bins_unknown_mode(fragments, genome_context):
+    with pytest.raises(ValueError):
+        count_in_bins(fragments, genome_context, 25, 'summit')
@@ -0,0 +1,57 @@
+import numpy as np
+from numpy.testing import assert_equal
+from bionumpy import Bed6
+from bionumpy.datatypes import Interval
+from bionumpy.genomic_data import Genome
+from bnp_macs2.blacklist import merge_regions, region_size, overlaps_regions, remove_blacklisted
+import pytest
+
+
+@pytest.fixture
+def genome_context():
+    return Genome({'chr1': 100, 'chr2': 60}).get_genome_context()
+
+
+@pytest.fixture
+def regions():
+    return Interval.from_entry_tuples(
+        [('chr1', 30, 40),
+         ('chr2', 50, 70),
+         ('chr1', 5, 12),
+         ('chr1', 35, 45)])
+
+
+@pytest.fixture
+def reads():
+    return Bed6.from_entry_tuples(
+        [('chr1', 0, 5, '.', '.', '+'),
+         ('chr1', 11, 22, '.', '.', '+'),
+         ('chr1', 20, 30, '.', '.', '-'),
+         ('chr1', 44, 60, '.', '.', '-'),
+         ('chr2', 15, 35, '.', '.', '+'),
+         ('chr2', 40, 51, '.', '.', '+')])
+
+
+def test_merge_regions(regions, genome_context):
+    merged = merge_regions(regions, genome_context)
+    assert_equal(merged.chromosome.raw(), [0, 0, 1])
+    assert_equal(merged.start, [5, 30, 50])
+    assert_equal(merged.stop, [12, 45, 60])
+    assert region_size(merged) == 7+15+10
+
+
+def test_overlaps_regions(reads, regions, genome_context):
+    merged = merge_regions(regions, genome_context)
+    assert_equal(overlaps_regions(reads, merged, genome_context),
+                 [False, True, False, True, False, True])
+
+
+def test_remove_blacklisted(reads, regions, genome_context):
+    filtered = remove_blacklisted(reads, merge_regions(regions, genome_context), genome_context)
+    assert_equal(filtered.start, [0, 20, 15])
+
+
+def test_merge_regions_unknown_chromosome(regions, genome_context):
+    regions = np.concatenate([regions, Interval.from_entry_tuples([('chrM', 0, 100)])])
+    merged = merge_regions(regions, genome_context)
+    assert_equal(merged.start, [5, 30, 50])
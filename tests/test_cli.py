@@ -0,0 +1,153 @@
+import subprocess
+import sys
+import numpy as np
+import bionumpy as bnp
+from numpy.testing import assert_equal
+from bnp_macs2 import cli
+from bnp_macs2.cli import main, bin_counts
+from bnp_macs2.macs2 import Macs2Params
+import pytest
+
+chrom_sizes = {'chr1': 5000, 'chr2': 3000, 'chr3': 4000}
+
+
+def simulate_bed_lines(rng, n_reads):
+    lines = []
+    for name, size in chrom_sizes.items():
+        starts = np.concatenate([rng.integers(0, size-36, n_reads),
+                                 rng.integers(1000, 1100, n_reads//3)])
+        lines.extend((name, int(start), int(start)+36, '.', 0, strand)
+                     for start, strand in zip(np.sort(starts), rng.choice(['+', '-'], len(starts))))
+    return lines
+
+
+def write_bed(filename, lines):
+    with open(filename, 'w') as f:
+        f.writelines('\t'.join(map(str, line)) + '\n' for line in lines)
+    return str(filename)
+
+
+@pytest.fixture
+def genome_file(tmp_path):
+    with open(tmp_path / 'genome.txt', 'w') as f:
+        f.writelines(f'{name}\t{size}\n' for name, size in chrom_sizes.items())
+    return str(tmp_path / 'genome.txt')
+
+
+@pytest.fixture
+def used_params(monkeypatch):
+    used = []
+
+    def record(**kwargs):
+        used.append(Macs2Params(**kwargs))
+        return used[-1]
+    monkeypatch.setattr(cli, 'Macs2Params', record)
+    return used
+
+
+@pytest.fixture
+def replicate_lines():
+    rng = np.random.default_rng(42)
+    return [simulate_bed_lines(rng, 150), simulate_bed_lines(rng, 100)]
+
+
+@pytest.fixture
+def replicate_files(tmp_path, replicate_lines):
+    return [write_bed(tmp_path / f'rep{i}.bed', lines) for i, lines in enumerate(replicate_lines)]
+
+
+@pytest.fixture
+def pooled_file(tmp_path, replicate_lines):
+    order = list(chrom_sizes)
+    lines = sorted(replicate_lines[0]+replicate_lines[1], key=lambda line: (order.index(line[0]), line[1]))
+    return write_bed(tmp_path / 'pooled.bed', lines)
+
+
+def assert_same_peaks(peaks, true_peaks):
+    assert len(true_peaks) > 0
+    assert_equal(peaks.chromosome.tolist(), true_peaks.chromosome.tolist())
+    assert_equal(peaks.start, true_peaks.start)
+    assert_equal(peaks.stop, true_peaks.stop)
+    np.testing.assert_allclose(np.asarray(peaks.p_value, dtype=float), np.asarray(true_peaks.p_value, dtype=float))
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_main_replicates_match_pooled(replicate_files, pooled_file, genome_file, tmp_path, stream):
+    true_peaks = main([pooled_file], genome_file, outprefix=str(tmp_path / 'pooled_'))
+    peaks = main(replicate_files, genome_file, outprefix=str(tmp_path / 'merged_'), stream=stream)
+    assert_same_peaks(peaks, true_peaks)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_main_unknown_chromosome(replicate_files, replicate_lines, genome_file, tmp_path, stream):
+    true_peaks = main(replicate_files, genome_file, outprefix=str(tmp_path / 'a_'), stream=stream)
+    with_unknown = write_bed(tmp_path / 'unknown.bed', replicate_lines[1] + [('chrUn', 10, 46, '.', 0, '+')])
+    peaks = main([replicate_files[0], with_unknown], genome_file, outprefix=str(tmp_path / 'b_'), stream=stream)
+    assert_same_peaks(peaks, true_peaks)
+
+
+def test_main_other_chromosome_order(replicate_lines, pooled_file, genome_file, tmp_path):
+    true_peaks = main([pooled_file], genome_file, outprefix=str(tmp_path / 'a_'))
+    order = ['chr2', 'chr3', 'chr1']
+    lines = sorted(replicate_lines[0]+replicate_lines[1], key=lambda line: (order.index(line[0]), line[1]))
+    unordered_file = write_bed(tmp_path / 'unordered.bed', lines)
+    peaks = main([unordered_file], genome_file, outprefix=str(tmp_path / 'b_'))
+    assert_same_peaks(peaks, true_peaks)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_main_scale_replicates(replicate_files, replicate_lines, genome_file, tmp_path, used_params, stream):
+    main(replicate_files, genome_file, outprefix=str(tmp_path / 'a_'), scale_replicates=True, stream=stream)
+    assert used_params[-1].n_reads == 2*min(len(lines) for lines in replicate_lines)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_main_blacklist(replicate_files, replicate_lines, genome_file, tmp_path, used_params, stream):
+    blacklist_file = write_bed(tmp_path / 'blacklist.bed', [('chr1', 1000, 1100), ('chrM', 0, 100)])
+    main(replicate_files, genome_file, outprefix=str(tmp_path / 'a_'), blacklist=blacklist_file, stream=stream)
+    n_kept = sum(not (line[0] == 'chr1' and line[1] < 1100 and line[2] > 1000)
+                 for lines in replicate_lines for line in lines)
+    assert used_params[-1].n_reads == n_kept
+    assert used_params[-1].effective_genome_size == sum(chrom_sizes.values())-100
+
+
+@pytest.mark.parametrize('blacklist_lines', [[('chrM', 0, 100)], []])
+def test_main_stream_blacklist_without_known_regions(replicate_files, genome_file, tmp_path, blacklist_lines):
+    blacklist_file = write_bed(tmp_path / 'blacklist.bed', blacklist_lines)
+    true_peaks = main(replicate_files, genome_file, outprefix=str(tmp_path / 'a_'))
+    peaks = main(replicate_files, genome_file, outprefix=str(tmp_path / 'b_'), blacklist=blacklist_file, stream=True)
+    assert_same_peaks(peaks, true_peaks)
+
+
+def test_main_blacklist_stream_matches_in_memory(replicate_files, genome_file, tmp_path):
+    blacklist_file = write_bed(tmp_path / 'blacklist.bed', [('chr2', 1050, 1080)])
+    true_peaks = main(replicate_files, genome_file, outprefix=str(tmp_path / 'a_'), blacklist=blacklist_file)
+    peaks = main(replicate_files, genome_file, outprefix=str(tmp_path / 'b_'), blacklist=blacklist_file, stream=True)
+    assert_same_peaks(peaks, true_peaks)
+    assert not np.any((peaks.chromosome.tolist() == np.array('chr2')) & (peaks.start < 1080) & (peaks.stop > 1050))
+
+
+def test_run_reads_and_genome_positional(replicate_files, genome_file, tmp_path):
+    outprefix = str(tmp_path / 'cli_')
+    subprocess.run([sys.executable, '-m', 'bnp_macs2.cli', replicate_files[0], genome_file,
+                    '--outprefix', outprefix], check=True)
+    assert len(bnp.open(outprefix+'peaks.narrowPeak').read()) > 0
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_bin_counts(replicate_files, replicate_lines, genome_file, tmp_path, n_jobs):
+    outprefix = str(tmp_path / 'a_')
+    bin_counts(replicate_files, genome_file, outprefix, bin_size=1000, n_jobs=n_jobs)
+    matrix = np.load(outprefix+'bin_counts.npy', mmap_mode='r')
+    assert matrix.shape == (2, 5+3+4)
+    assert_equal(matrix.sum(axis=1), [len(lines) for lines in replicate_lines])
+    bins = bnp.open(outprefix+'bins.bed').read()
+    assert_equal(bins.chromosome.tolist(), ['chr1']*5 + ['chr2']*3 + ['chr3']*4)
+    assert_equal(bins.start[:6], [0, 1000, 2000, 3000, 4000, 0])
+
+
+def test_bin_counts_unknown_chromosome(replicate_lines, genome_file, tmp_path):
+    with_unknown = write_bed(tmp_path / 'unknown.bed', replicate_lines[0] + [('chrUn', 10, 46, '.', 0, '+')])
+    outprefix = str(tmp_path / 'a_')
+    bin_counts([with_unknown], genome_file, outprefix, bin_size=1000)
+    assert np.load(outprefix+'bin_counts.npy').sum() == len(replicate_lines[0])
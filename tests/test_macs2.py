@@ -160,3 +160,10 @@ def testmacs2_acceptance_stream(intervals, genome_context, macs2_obj: Macs2):
     genomic_intervals = GenomicIntervals.from_intervals(intervals, genome_context)
     real_peaks = macs2_obj.run(genomic_intervals)
     assert_equal(peaks.start, real_peaks.start)
+
+
+def test_call_peaks_blacklist(pileup, params, debug_listner):
+    blacklist = Interval.from_entry_tuples([('chr1', 20, 40)])
+    macs2_obj = Macs2(params, debug_listner, blacklist=blacklist)
+    called_peaks = macs2_obj.call_peaks(np.log(pileup)).get_data()
+    assert_bnpdataclass_equal(called_peaks, Interval.from_entry_tuples([('chr1', 40, 60)]))
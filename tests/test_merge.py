@@ -0,0 +1,87 @@
+import numpy as np
+from numpy.testing import assert_equal
+from bionumpy import Bed6
+from bionumpy.genomic_data import Genome
+from bionumpy.streams import NpDataclassStream
+from bnp_macs2.merge import merge_sorted_intervals, merge_sorted_interval_streams, downsample, subsample_stream
+import pytest
+
+
+@pytest.fixture
+def genome_context():
+    return Genome({'chr1': 100, 'chr2': 60, 'chr3': 80}).get_genome_context()
+
+
+@pytest.fixture
+def replicates():
+    return [Bed6.from_entry_tuples(
+        [('chr1', 10, 20, '.', '.', '-'),
+         ('chr1', 40, 60, '.', '.', '-'),
+         ('chr3', 15, 35, '.', '.', '+')]),
+            Bed6.from_entry_tuples(
+        [('chr1', 11, 22, '.', '.', '+'),
+         ('chr2', 15, 35, '.', '.', '+'),
+         ('chr2', 25, 45, '.', '.', '-')]),
+            Bed6.from_entry_tuples(
+        [('chr2', 5, 25, '.', '.', '+'),
+         ('chr3', 1, 21, '.', '.', '-')])]
+
+
+@pytest.fixture
+def merged_starts():
+    return [10, 40, 11, 15, 25, 5, 15, 1]
+
+
+def test_merge_sorted_intervals(replicates, genome_context, merged_starts):
+    merged = merge_sorted_intervals(replicates, genome_context)
+    assert_equal(merged.start, merged_starts)
+    assert_equal(merged.chromosome.raw(), [0, 0, 0, 1, 1, 1, 2, 2])
+
+
+def test_merge_sorted_interval_streams(replicates, genome_context, merged_starts):
+    streams = [NpDataclassStream(iter([r[:1], r[1:]])) for r in replicates]
+    merged = np.concatenate(list(merge_sorted_interval_streams(streams, genome_context)))
+    assert_equal(merged.start, merged_starts)
+
+
+def test_merge_sorted_interval_streams_empty_chunks(replicates, genome_context, merged_starts):
+    streams = [NpDataclassStream(iter([r[:0], r, r[:0]])) for r in replicates]
+    streams.append(NpDataclassStream(iter([replicates[0][:0]])))
+    merged = np.concatenate(list(merge_sorted_interval_streams(streams, genome_context)))
+    assert_equal(merged.start, merged_starts)
+
+
+def test_merge_sorts_chromosomes(replicates, genome_context, merged_starts):
+    lexical = np.concatenate([replicates[0][:2], replicates[1][1:], replicates[0][2:]])
+    merged = merge_sorted_intervals([lexical, replicates[1][:1], replicates[2]], genome_context)
+    assert_equal(merged.chromosome.raw(), [0, 0, 0, 1, 1, 1, 2, 2])
+    assert_equal(merged.start, [10, 40, 11, 15, 25, 5, 15, 1])
+
+
+def test_merge_stream_unsorted_raises(replicates, genome_context):
+    streams = [NpDataclassStream(iter([replicates[0][::-1]])), NpDataclassStream(iter([replicates[1]]))]
+    with pytest.raises(ValueError):
+        list(merge_sorted_interval_streams(streams, genome_context))
+
+
+def test_merge_unknown_chromosomes(replicates, genome_context, merged_starts):
+    unknown = Bed6.from_entry_tuples([('chrUn', 3, 13, '.', '.', '+')])
+    merged = merge_sorted_intervals([np.concatenate([replicates[0], unknown])] + replicates[1:], genome_context)
+    assert_equal(merged.start, merged_starts)
+    streams = [NpDataclassStream(iter([r])) for r in [np.concatenate([replicates[0], unknown])] + replicates[1:]]
+    merged = np.concatenate(list(merge_sorted_interval_streams(streams, genome_context)))
+    assert_equal(merged.start, merged_starts)
+
+
+def test_downsample(replicates):
+    intervals = np.concatenate(replicates)
+    sampled = downsample(intervals, 4)
+    assert len(sampled) == 4
+    assert np.all(np.isin(sampled.start, intervals.start))
+
+
+def test_subsample_stream(replicates):
+    intervals = np.concatenate(replicates)
+    stream = NpDataclassStream(iter([intervals[:3], intervals[3:5], intervals[5:]]))
+    sampled = np.concatenate(list(subsample_stream(stream, len(intervals), 5)))
+    assert len(sampled) == 5